@@ -0,0 +1,57 @@
+"""
+Gunicorn configuration for the Orders service
+"""
+import os
+import sys
+
+# psycopg waits for the database in a C function that gevent cannot
+# monkey patch, so a gevent worker would run its queries one at a time.
+# Its select() based wait is patched, and must be chosen before the app
+# first imports psycopg.
+os.environ.setdefault("PSYCOPG_WAIT_FUNC", "wait_select")
+
+# Every route waits on the database, so use cooperative gevent workers
+# that keep serving other requests while one is blocked on I/O. The
+# gevent worker monkey patches the standard library when it boots.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+# A single gevent worker serves many requests at once. The CPU count of the
+# host says nothing about the limits of the pod (0.5 CPU and 128Mi in
+# k8s/deployment.yaml), so add workers only through GUNICORN_WORKERS
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+
+def post_worker_init(worker):
+    """Creates the tables of the service once a worker has loaded it
+
+    Importing the service does not connect to the database, so that tests
+    can import it without one. A worker that cannot reach the database
+    exits with code 4, which stops gunicorn instead of respawning it.
+    """
+    # pylint: disable=import-outside-toplevel, unused-argument
+    from service import app
+    from service.models import db
+
+    try:
+        with app.app_context():
+            db.create_all()
+    except Exception as error:  # pylint: disable=broad-except
+        app.logger.critical("%s: Cannot continue", error)
+        sys.exit(4)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Gives each worker its own database connection pool
+
+    When the app is preloaded in the master (gunicorn --preload) the
+    workers inherit its pooled connections, so they are discarded here
+    without being closed and every worker opens its own.
+    """
+    service = sys.modules.get("service")
+    if service is None:
+        return  # the app is loaded after the fork, nothing was inherited
+
+    from service.models import db  # pylint: disable=import-outside-toplevel
+
+    with service.app.app_context():
+        db.engine.dispose(close=False)
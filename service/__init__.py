@@ -18,6 +18,7 @@ app.config.from_object(config)
 
 app.url_map.strict_slashes = False
 
+app.config["DEBUG"] = False
 app.config["SECRET_KEY"] = "secret-for-dev"
 app.config["LOGGING_LEVEL"] = logging.INFO
 app.config["API_KEY"] = os.getenv("API_KEY")
@@ -43,7 +44,8 @@ api = Api(
 from service import routes, models  # noqa: E402, E261
 
 # pylint: disable=wrong-import-position
-from service.common import error_handlers, cli_commands  # noqa: F401, E402
+from service.common import error_handlers, cli_commands, representations  # noqa: F401, E402
+from service.common.cache import order_cache  # noqa: E402
 
 # Set up logging for production
 log_handlers.init_logging(app, "gunicorn.error")
@@ -53,7 +55,8 @@ app.logger.info("  S E R V I C E   R U N N I N G  ".center(70, "*"))
 app.logger.info(70 * "*")
 
 try:
-    models.init_db(app)  # make our SQLAlchemy tables
+    models.init_db(app)  # bind SQLAlchemy, the tables are made by gunicorn.conf.py
+    order_cache.init_app(app)  # connect to the order cache if configured
 except Exception as error:  # pylint: disable=broad-except
     app.logger.critical("%s: Cannot continue", error)
     # gunicorn requires exit code 4 to stop spawning workers when they die
@@ -0,0 +1,97 @@
+"""
+Module: cache
+
+Redis cache-aside store for serialized Orders
+
+Caching is disabled when REDIS_URL is not configured, and every Redis
+error falls back to the database so an outage never fails a request.
+"""
+import logging
+import orjson
+import redis
+
+logger = logging.getLogger("flask.app")
+
+
+class OrderCache:
+    """Caches serialized Orders in Redis keyed by their id"""
+
+    def __init__(self):
+        self.client = None
+        self.ttl = 300
+
+    def init_app(self, app):
+        """Connects to Redis if the app is configured with a REDIS_URL"""
+        url = app.config.get("REDIS_URL")
+        self.ttl = app.config.get("CACHE_TTL", self.ttl)
+        if not url:
+            logger.info("REDIS_URL is not set, order caching is disabled")
+            self.client = None
+            return
+        logger.info("Initializing order cache")
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+            health_check_interval=30,
+        )
+
+    @staticmethod
+    def key(order_id):
+        """Returns the cache key of an Order"""
+        return f"order:{order_id}"
+
+    @staticmethod
+    def etag_key(order_id):
+        """Returns the cache key of an Order's ETag"""
+        return f"order:{order_id}:etag"
+
+    def get(self, order_id):
+        """Returns the cached serialized Order or None on a miss"""
+        if self.client is None:
+            return None
+        try:
+            cached = self.client.get(self.key(order_id))
+        except redis.RedisError as error:
+            logger.warning("Order cache unavailable: %s", error)
+            return None
+        return orjson.loads(cached) if cached is not None else None
+
+    def get_with_etag(self, order_id):
+        """Returns the cached serialized Order and its ETag or (None, None)"""
+        if self.client is None:
+            return None, None
+        try:
+            cached, etag = self.client.mget(
+                self.key(order_id), self.etag_key(order_id)
+            )
+        except redis.RedisError as error:
+            logger.warning("Order cache unavailable: %s", error)
+            return None, None
+        if cached is None or etag is None:
+            return None, None
+        return orjson.loads(cached), etag.decode()
+
+    def set(self, order_id, data, etag=None):
+        """Caches a serialized Order and optionally its ETag"""
+        if self.client is None:
+            return
+        try:
+            self.client.setex(self.key(order_id), self.ttl, orjson.dumps(data))
+            if etag is not None:
+                self.client.setex(self.etag_key(order_id), self.ttl, etag)
+        except redis.RedisError as error:
+            logger.warning("Order cache unavailable: %s", error)
+
+    def invalidate(self, order_id):
+        """Removes an Order from the cache"""
+        if self.client is None:
+            return
+        try:
+            self.client.delete(self.key(order_id), self.etag_key(order_id))
+        except redis.RedisError as error:
+            logger.warning("Order cache unavailable: %s", error)
+
+
+# Create the cache object to be initialized later in init_app()
+order_cache = OrderCache()
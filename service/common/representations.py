@@ -0,0 +1,39 @@
+"""
+Module: representations
+
+Response encoders for the REST API
+"""
+import orjson
+from flask import Response, make_response, stream_with_context
+from service import api
+
+
+######################################################################
+# JSON Representation
+######################################################################
+@api.representation("application/json")
+def output_json(data, code, headers=None):
+    """Makes a Flask response with a JSON body encoded by orjson"""
+    resp = make_response(orjson.dumps(data), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def stream_json_list(resources, code=200):
+    """Makes a streamed JSON array response of serialized resources
+
+    Each resource is serialized and encoded as it is sent, so the whole
+    list is never held in memory as dictionaries or as one encoded body.
+    """
+
+    def generate():
+        yield b"["
+        for index, resource in enumerate(resources):
+            if index:
+                yield b","
+            yield orjson.dumps(resource.serialize())
+        yield b"]"
+
+    return Response(
+        stream_with_context(generate()), status=code, mimetype="application/json"
+    )
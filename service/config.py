@@ -12,5 +12,19 @@ DATABASE_URI = os.getenv(
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Size the connection pool of one worker process. Every gunicorn worker
+# opens its own pool, so workers * (pool_size + max_overflow) must stay
+# well below the max_connections of the database (100 by default)
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": int(os.getenv("DATABASE_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", "5")),
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+
+# Redis cache for serialized Orders, disabled when REDIS_URL is not set
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "s3cr3t-key-shhhh")
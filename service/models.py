@@ -3,10 +3,14 @@ Models for Order
 
 All of the models are stored in this module
 """
+import hashlib
 import logging
 from datetime import datetime
 from enum import Enum
+from operator import attrgetter
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, lambda_stmt, select, update
+from sqlalchemy.orm import raiseload, selectinload
 
 
 logger = logging.getLogger("flask.app")
@@ -17,7 +21,11 @@ db = SQLAlchemy()
 
 # Function to initialize the database
 def init_db(app):
-    """Initializes the SQLAlchemy app"""
+    """Initializes the SQLAlchemy app
+
+    This does not connect to the database: call db.create_all() to make
+    the tables, as the gunicorn workers do when they start
+    """
     Order.init_db(app)
 
 
@@ -49,12 +57,13 @@ class Item(db.Model):
     Class that represents an Item
     """
 
-    app = None
-
     # Table Schema
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(
-        db.Integer, db.ForeignKey("order.id", ondelete="CASCADE"), nullable=False
+        db.Integer,
+        db.ForeignKey("order.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     title = db.Column(db.String(255), nullable=False)
     amount = db.Column(db.Integer, nullable=False)
@@ -66,6 +75,10 @@ class Item(db.Model):
         db.Enum(ItemStatus), nullable=False, server_default=(ItemStatus.INSTOCK.name)
     )
 
+    # Columns copied as-is by serialize(), read in a single attrgetter call
+    _serialized_fields = ("id", "order_id", "title", "amount", "price", "product_id")
+    _serialized_values = attrgetter(*_serialized_fields)
+
     def __repr__(self):
         return f"<Item {self.title} id=[{self.id}]>"
 
@@ -76,7 +89,7 @@ class Item(db.Model):
         logger.info("Creating %s", self.title)
         self.id = None  # pylint: disable=invalid-name
         db.session.add(self)
-        # print("william")
+        self.touch_order()
         db.session.commit()
 
     def update(self):
@@ -84,25 +97,32 @@ class Item(db.Model):
         Updates a Item to the database
         """
         logger.info("Saving %s", self.title)
+        self.touch_order()
         db.session.commit()
 
     def delete(self):
         """Removes a Item from the data store"""
         logger.info("Deleting %s", self.title)
         db.session.delete(self)
+        self.touch_order()
         db.session.commit()
 
+    def touch_order(self):
+        """Marks the Order of this Item as modified so its ETag changes"""
+        # Flush first so an Item attached through the order relationship
+        # has its order_id set before it is used in the WHERE clause
+        db.session.flush()
+        db.session.execute(
+            db.update(Order)
+            .where(Order.id == self.order_id)
+            .values(updated_at=datetime.utcnow())
+        )
+
     def serialize(self):
         """Serializes a Item into a dictionary"""
-        return {
-            "id": self.id,
-            "order_id": self.order_id,
-            "title": self.title,
-            "amount": self.amount,
-            "price": self.price,
-            "product_id": self.product_id,
-            "status": self.status.name,
-        }
+        item = dict(zip(self._serialized_fields, self._serialized_values(self)))
+        item["status"] = self.status.name
+        return item
 
     def deserialize(self, data):
         """
@@ -129,27 +149,75 @@ class Item(db.Model):
             ) from error
         return self
 
-    @classmethod
-    def init_db(cls, app):
-        """Initializes the database session"""
-        logger.info("Initializing database")
-        cls.app = app
-        # This is where we initialize SQLAlchemy from the Flask app
-        db.init_app(app)
-        app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
-
     @classmethod
     def all(cls):
         """Returns all of the Items in the database"""
         logger.info("Processing all Items")
-        return cls.query.all()
+        return db.session.scalars(select(cls)).all()
 
     @classmethod
     def find(cls, by_id):
         """Finds a Item by it's ID"""
         logger.info("Processing lookup for id %s ...", by_id)
-        return cls.query.get(by_id)
+        return db.session.get(cls, by_id)
+
+    @classmethod
+    def find_in_order(cls, order_id, by_id):
+        """Finds a Item by it's ID only if it belongs to the given Order"""
+        logger.info("Processing lookup for id %s in order %s ...", by_id, order_id)
+        stmt = select(cls).where(cls.id == by_id, cls.order_id == order_id)
+        return db.session.scalars(stmt).one_or_none()
+
+    @classmethod
+    def list_for_order(cls, order_id):
+        """Returns the serialized Items of an Order without loading Item objects
+
+        Args:
+            order_id (int): the id of the Order whose Items you want
+        """
+        logger.info("Processing item list for order %s ...", order_id)
+        stmt = (
+            select(
+                cls.id,
+                cls.order_id,
+                cls.title,
+                cls.amount,
+                cls.price,
+                cls.product_id,
+                cls.status,
+            )
+            .where(cls.order_id == order_id)
+            .order_by(cls.id)
+        )
+        return [
+            {**row, "status": row["status"].name}
+            for row in db.session.execute(stmt).mappings()
+        ]
+
+    @classmethod
+    def update_in_order(cls, order_id, by_id, **values):
+        """Updates a Item of an Order with a single UPDATE ... RETURNING
+
+        Returns the updated Item, or None if it does not belong to the Order
+        """
+        logger.info("Processing update for id %s in order %s ...", by_id, order_id)
+        if not values:
+            # An UPDATE needs at least one column to SET
+            return cls.find_in_order(order_id, by_id)
+        stmt = (
+            update(cls)
+            .where(cls.id == by_id, cls.order_id == order_id)
+            .values(**values)
+            .returning(cls)
+        )
+        item = db.session.execute(stmt).scalar_one_or_none()
+        if item is not None:
+            item.touch_order()
+            # Detach the returned row so the commit does not expire it and
+            # force another SELECT when it is serialized
+            db.session.expunge(item)
+        db.session.commit()
+        return item
 
     @classmethod
     def find_by_title(cls, title):
@@ -159,7 +227,7 @@ class Item(db.Model):
             title (string): the title of the Items you want to match
         """
         logger.info("Processing name query for %s ...", title)
-        return cls.query.filter(cls.title == title)
+        return db.session.scalars(select(cls).where(cls.title == title)).all()
 
 
 class Order(db.Model):
@@ -175,6 +243,9 @@ class Order(db.Model):
         db.String(63)
     )
     create_time = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
+    )
     address = db.Column(db.String(255), nullable=False)
     cost_amount = db.Column(db.Float, nullable=False)
     status = db.Column(
@@ -183,6 +254,10 @@ class Order(db.Model):
     user_id = db.Column(db.Integer, nullable=False)
     items = db.relationship("Item", backref="order", lazy=True, passive_deletes=True)
 
+    # Columns copied as-is by serialize(), read in a single attrgetter call
+    _serialized_fields = ("id", "name", "address", "cost_amount", "user_id")
+    _serialized_values = attrgetter(*_serialized_fields)
+
     def __repr__(self):
         return f"<Order {self.name} id=[{self.id}]>"
 
@@ -208,22 +283,25 @@ class Order(db.Model):
         db.session.delete(self)
         db.session.commit()
 
-    def serialize(self):
-        """Serializes a Order into a dictionary"""
-        order = {
-            "id": self.id,
-            "name": self.name,
-            "create_time": self.create_time.isoformat(),
-            "address": self.address,
-            "cost_amount": self.cost_amount,
-            "status": self.status.name,
-            "user_id": self.user_id,
-            "items": [],
-        }
-
-        for item in self.items:
-            order["items"].append(item.serialize())
+    @property
+    def etag(self):
+        """Returns an entity tag that changes whenever the Order is modified"""
+        updated_at = self.updated_at or self.create_time
+        version = f"{self.id}:{updated_at.timestamp()}"
+        return hashlib.md5(version.encode(), usedforsecurity=False).hexdigest()
 
+    def serialize(self, include_items=True):
+        """Serializes a Order into a dictionary
+
+        Args:
+            include_items (bool): serialize the Items too; when False they
+                are not loaded at all and the "items" key is left out
+        """
+        order = dict(zip(self._serialized_fields, self._serialized_values(self)))
+        order["create_time"] = self.create_time.isoformat()
+        order["status"] = self.status.name
+        if include_items:
+            order["items"] = [item.serialize() for item in self.items]
         return order
 
     def deserialize(self, data):
@@ -267,19 +345,117 @@ class Order(db.Model):
         # This is where we initialize SQLAlchemy from the Flask app
         db.init_app(app)
         app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
 
     @classmethod
     def all(cls):
         """Returns all of the Orders in the database"""
         logger.info("Processing all Orders")
-        return cls.query.all()
+        return db.session.scalars(select(cls)).all()
+
+    @classmethod
+    def count(cls):
+        """Returns the number of Orders in the database"""
+        logger.info("Processing count of Orders")
+        return db.session.scalar(select(func.count(cls.id)))  # pylint: disable=not-callable
 
     @classmethod
     def find(cls, by_id):
         """Finds a Order by it's ID"""
         logger.info("Processing lookup for id %s ...", by_id)
-        return cls.query.get(by_id)
+        return db.session.get(cls, by_id)
+
+    @classmethod
+    def find_with_items(cls, by_id):
+        """Finds a Order by it's ID and loads its Items in the same lookup"""
+        logger.info("Processing lookup with items for id %s ...", by_id)
+        return db.session.get(
+            cls, by_id, options=[selectinload(cls.items), raiseload("*")]
+        )
+
+    @classmethod
+    def find_many(cls, ids):
+        """Finds the Orders with the given IDs, and their Items, in one lookup
+
+        Args:
+            ids (list): the ids of the Orders you want
+        """
+        logger.info("Processing lookup for ids %s ...", ids)
+        stmt = (
+            select(cls)
+            .where(cls.id.in_(ids))
+            .options(selectinload(cls.items), raiseload("*"))
+            .order_by(cls.id)
+        )
+        return db.session.scalars(stmt).all()
+
+    @classmethod
+    def exists(cls, by_id):
+        """Returns True if a Order with the given ID exists"""
+        logger.info("Processing existence check for id %s ...", by_id)
+        return db.session.scalar(select(select(cls.id).where(cls.id == by_id).exists()))
+
+    @classmethod
+    def get_or_404(cls, by_id):
+        """Finds a Order by it's ID or aborts with a 404 Not Found"""
+        logger.info("Processing lookup for id %s ...", by_id)
+        return db.get_or_404(
+            cls, by_id, description=f"Order with id '{by_id}' was not found."
+        )
+
+    @classmethod
+    def update_by_id(cls, by_id, *conditions, **values):
+        """Updates a Order with a single UPDATE ... RETURNING
+
+        Any extra conditions are added to the WHERE clause, so the Order is
+        only written when they hold. Returns the updated Order without its
+        Items, or None if no Order was updated
+        """
+        logger.info("Processing update for id %s ...", by_id)
+        stmt = (
+            update(cls)
+            .where(cls.id == by_id, *conditions)
+            .values(**values)
+            .returning(cls)
+        )
+        order = db.session.execute(stmt).scalar_one_or_none()
+        if order is not None:
+            # Detach the returned row so the commit does not expire it and
+            # force another SELECT when it is serialized
+            db.session.expunge(order)
+        db.session.commit()
+        return order
+
+    @classmethod
+    def find_by_filters(
+        cls, order_id=None, user_id=None, status=None, name=None, limit=100, offset=0
+    ):  # pylint: disable=too-many-arguments
+        """Returns a page of Orders matching the given filters, with their Items loaded
+
+        The statement is built from cached lambdas so each combination of
+        filters is compiled to SQL only once
+
+        Args:
+            order_id (int): the id of the Order you want to match
+            user_id (int): the user id of the Orders you want to match
+            status (string): the status name of the Orders you want to match
+            name (string): the name of the Orders you want to match
+            limit (int): the maximum number of Orders to return
+            offset (int): the number of matching Orders to skip, ordered by id
+        """
+        logger.info("Processing filter query for %s ...", (order_id, user_id, status, name))
+        stmt = lambda_stmt(
+            lambda: select(Order).options(selectinload(Order.items), raiseload("*"))
+        )
+        if order_id:
+            stmt += lambda s: s.where(Order.id == order_id)
+        if user_id:
+            stmt += lambda s: s.where(Order.user_id == user_id)
+        if status:
+            stmt += lambda s: s.where(Order.status == status)
+        if name:
+            stmt += lambda s: s.where(Order.name == name)
+        stmt += lambda s: s.order_by(Order.id).limit(limit).offset(offset)
+        return db.session.scalars(stmt).all()
 
     @classmethod
     def find_by_name(cls, name):
@@ -289,4 +465,4 @@ class Order(db.Model):
             name (string): the name of the Orders you want to match
         """
         logger.info("Processing name query for %s ...", name)
-        return cls.query.filter(cls.name == name)
+        return db.session.scalars(select(cls).where(cls.name == name)).all()
@@ -18,10 +18,13 @@ POST /orders/{order_id}/items - creates a new Order Item record in the database
 PUT /orders/{order_id}/items/{item_id} - updates an Order Item record in the database
 DELETE /orders/{order_id}/items/{item_id} - deletes an Order Item record in the database
 """
-from flask import request, url_for, abort, make_response
+from flask import request, abort, make_response, Response
+from werkzeug.http import quote_etag
 from flask_restx import Resource, fields, reqparse
 from service.common import status  # HTTP Status Codes
-from service.models import Order, Item
+from service.models import Order, Item, OrderStatus, ItemStatus
+from service.common.cache import order_cache
+from service.common.representations import stream_json_list
 
 
 # Import Flask application
@@ -59,7 +62,7 @@ Items_model = api.inherit(
     "ItemsModel",
     create_item_model,
     {
-        "id": fields.String(
+        "id": fields.Integer(
             readOnly=True,
             description="The unique item_id assigned internally by service",
         ),
@@ -97,14 +100,14 @@ Orders_model = api.inherit(
     "OrdersModel",
     create_model,
     {
-        "id": fields.String(
+        "id": fields.Integer(
             readOnly=True,
             description="The unique order_id assigned internally by service",
         ),
     },
 )
 
-# query string arguments
+# query string arguments, used for the Swagger docs only
 orders_args = reqparse.RequestParser()
 orders_args.add_argument(
     "order_id", type=int, location="args", required=False, help="Get Order By Id"
@@ -118,22 +121,55 @@ orders_args.add_argument(
 orders_args.add_argument(
     "name", type=str, location="args", required=False, help="Get Order By Name"
 )
+orders_args.add_argument(
+    "ids", type=str, location="args", required=False, help="Get Orders By Ids, comma separated"
+)
+orders_args.add_argument(
+    "limit", type=int, location="args", required=False, help="Page size, 100 by default"
+)
+orders_args.add_argument(
+    "offset", type=int, location="args", required=False, help="Orders to skip"
+)
 
 
 ######################################################################
 #  U T I L I T Y   F U N C T I O N S
 ######################################################################
 
+# path of the order collection, used to build Location headers without url_for
+ORDERS_PATH = f"{api.prefix}/orders"
+
+# largest page of Orders a single list request can ask for
+MAX_PAGE_SIZE = 1000
+
+
+def item_location(order_id, item_id):
+    """Returns the external URL of an Item without walking the URL map"""
+    return f"{request.url_root.rstrip('/')}{ORDERS_PATH}/{order_id}/items/{item_id}"
 
-def check_content_type(media_type):
-    """Checks that the media type is correct"""
-    content_type = request.headers.get("Content-Type")
-    if content_type and content_type == media_type:
+
+def int_arg(name, default=None):
+    """Returns an integer query parameter, or aborts if it is not an integer"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, f"{name} must be an integer")
+
+
+@app.before_request
+def check_content_type():
+    """Rejects order writes with a non JSON body before the body is parsed"""
+    if request.method not in ("POST", "PUT") or not request.content_length:
+        return
+    if not request.path.startswith(ORDERS_PATH) or request.mimetype == "application/json":
         return
-    app.logger.error("Invalid Content-Type: %s", content_type)
+    app.logger.error("Invalid Content-Type: %s", request.content_type)
     abort(
         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-        f"Content-Type must be {media_type}",
+        "Content-Type must be application/json",
     )
 
 
@@ -157,45 +193,28 @@ class OrderCollection(Resource):
         """
         Create a new Order
         """
-        app.logger.info("Request to create an Order")
+        app.logger.debug("Request to create an Order")
 
-        check_content_type("application/json")
-
-        # Deserialize the order data
+        # Deserialize the order data, items are attached to the order
         order_data = api.payload
         order = Order()
         order.deserialize(order_data)
 
-        # Save the order to the database
+        # Save the order and its items to the database in one commit
         order.create()
 
-        # Process and save items if present
-        if "items" in order_data:
-            for item_data in order_data["items"]:
-                item = Item()
-                item_data["order_id"] = order.id
-                item.deserialize(item_data)
-                # item.order_id = order.id  # Set the order_id for each item
-                item.create()
-
         app.logger.info("Order with ID [%s] created", order.id)
 
-        location_url = url_for("order_collection", order_id=order.id, _external=True)
-
-        # print("After creating:", order.serialize())
-        # print(location_url)
+        location_url = f"{request.url_root.rstrip('/')}{ORDERS_PATH}?order_id={order.id}"
 
         return order.serialize(), status.HTTP_201_CREATED, {"Location": location_url}
 
     @api.doc("get orders")
     @api.expect(orders_args, validate=True)
-    @api.marshal_with(Orders_model)
+    @api.response(200, "Success", [Orders_model])
     def get(self):
         """Find an order by ID or Returns all of the Orders"""
-        app.logger.info("Request for Order list")
-        # print(f"request.args = {request.args.to_dict(flat=False)}")
-
-        orders = []  # A list of all orders satisfying requirements
+        app.logger.debug("Request for Order list")
 
         # Process the query string if any
         # Supported formats:
@@ -204,46 +223,33 @@ class OrderCollection(Resource):
         #       "?order_id={some integer}" or
         #       "?order_id={some integer}&user_id={user id having this order}"
         # - All orders of a particular user ID: "?user_id={some integer}"
+        # - Several orders at once: "?ids={some integer},{some integer},..."
+        # Results are paged by "?limit={page size}&offset={orders to skip}"
+
+        if "ids" in request.args:
+            try:
+                ids = [int(order_id) for order_id in request.args["ids"].split(",")]
+            except ValueError:
+                abort(status.HTTP_400_BAD_REQUEST, "ids must be a comma separated list of integers")
+            return stream_json_list(Order.find_many(ids), status.HTTP_200_OK)
+
+        orders = Order.find_by_filters(
+            order_id=int_arg("order_id"),
+            user_id=int_arg("user_id"),
+            status=request.args.get("status"),
+            name=request.args.get("name"),
+            limit=min(max(int_arg("limit", 100), 0), MAX_PAGE_SIZE),
+            offset=max(int_arg("offset", 0), 0),
+        )
 
-        # This corresponds to "?"
-        query = Order.query
-        query_params = orders_args.parse_args()
-
-        # This corresponds to "?order_id={some integer}"
-        if query_params["order_id"]:
-            order_id = query_params["order_id"]
-            query = query.filter(Order.id == order_id)
-
-        # Check for 'user_id'
-        if query_params["user_id"]:
-            user_id = query_params["user_id"]
-            query = query.filter(Order.user_id == user_id)
-
-        # Check for 'status'
-        if query_params["status"]:
-            status_ = query_params["status"]
-            query = query.filter(Order.status == status_)
-
-        if query_params["name"]:
-            name = query_params["name"]
-            query = query.filter(Order.name == name)
-
-        else:
-            orders = Order.all()
-
-        # Execute the query
-        orders = query.all()
-
-        # Return as an array of dictionaries
-        results = [order.serialize() for order in orders]
-
-        return results, status.HTTP_200_OK
+        # Return as a streamed array of dictionaries
+        return stream_json_list(orders, status.HTTP_200_OK)
 
 
 ######################################################################
 #  PATH: /orders/{id}
 ######################################################################
-@api.route("/orders/<order_id>")
+@api.route("/orders/<int:order_id>")
 @api.param("order_id", "The Order identifier")
 class OrderResource(Resource):
     """
@@ -255,19 +261,26 @@ class OrderResource(Resource):
     # ------------------------------------------------------------------
     @api.doc("get_order")
     @api.response(404, "Order not found")
-    @api.marshal_with(Orders_model)
+    @api.response(200, "Success", Orders_model)
     def get(self, order_id):
         """Find an order by ID or Returns all of the Orders"""
-        app.logger.info("Request for Read an Order")
-        order = Order.find(order_id)
-
-        if order is not None:
-            results = order.serialize()
-            return results, status.HTTP_200_OK
-
-        print(order_id, order)
+        app.logger.debug("Request for Read an Order")
+        results, etag = order_cache.get_with_etag(order_id)
+        if results is None:
+            order = Order.find_with_items(order_id)
+            if order is None:
+                app.logger.debug("Order with id [%s] not found", order_id)
+                abort(
+                    status.HTTP_404_NOT_FOUND,
+                    f"Order with id '{order_id}' was not found.",
+                )
+            results, etag = order.serialize(), order.etag
+            order_cache.set(order.id, results, etag)
 
-        abort(status.HTTP_404_NOT_FOUND, f"Order with id '{order_id}' was not found.")
+        headers = {"ETag": quote_etag(etag)}
+        if request.if_none_match.contains(etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return results, status.HTTP_200_OK, headers
 
     # ------------------------------------------------------------------
     # UPDATE AN EXISTING ORDER
@@ -276,32 +289,29 @@ class OrderResource(Resource):
     @api.response(404, "Order not found")
     @api.response(400, "The posted Order data was not valid")
     @api.expect(Orders_model)
-    @api.marshal_with(Orders_model)
+    @api.response(200, "Success", Orders_model)
     def put(self, order_id):
         """
         Update a Order
 
         This endpoint will update a Order based the body that is posted
         """
-        app.logger.info("Request to Update a Order with id [%s]", order_id)
-
-        order = Order.find(order_id)
-
-        if not order:
-            abort(status.HTTP_404_NOT_FOUND, "Order not found")
+        app.logger.debug("Request to Update a Order with id [%s]", order_id)
 
-        # Update the 'name' and 'address' fields of the order
+        # Update the 'name', 'address' and 'status' fields of the order
         data = api.payload
-        if "name" in data:
-            order.name = data["name"]
-        if "address" in data:
-            order.address = data["address"]
+        values = {key: data[key] for key in ("name", "address") if key in data}
         if "status" in data:
-            order.status = data["status"]
+            values["status"] = getattr(OrderStatus, data["status"])
+        order = Order.update_by_id(order_id, **values)
+        if order is None:
+            abort(
+                status.HTTP_404_NOT_FOUND, f"Order with id '{order_id}' was not found."
+            )
 
-        order.update()
+        order_cache.invalidate(order.id)
 
-        return order.serialize(), status.HTTP_200_OK
+        return order.serialize(include_items=False), status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # DELETE An order
@@ -314,10 +324,11 @@ class OrderResource(Resource):
 
         This endpoint will delete a order based the id specified in the path
         """
-        app.logger.info("Request to Delete a order with id [%s]", order_id)
+        app.logger.debug("Request to Delete a order with id [%s]", order_id)
         order = Order.find(order_id)
         if order:
             order.delete()
+            order_cache.invalidate(order_id)
             app.logger.info("order with id [%s] was deleted", order_id)
 
         return "", status.HTTP_204_NO_CONTENT
@@ -326,7 +337,7 @@ class OrderResource(Resource):
 ######################################################################
 #  PATH: /orders/{id}/cancel
 ######################################################################
-@api.route("/orders/<order_id>/cancel")
+@api.route("/orders/<int:order_id>/cancel")
 @api.param("order_id", "The order identifier")
 class OrderCancelResource(Resource):
     """cancel actions on a order"""
@@ -340,20 +351,28 @@ class OrderCancelResource(Resource):
 
         This endpoint will cancel a order and make it unavailable
         """
-        app.logger.info("Request to cancel a order")
-        order = Order.find(order_id)
-        if not order:
-            abort(status.HTTP_404_NOT_FOUND, "Order not found")
-        else:
-            order.status = "CANCELED"
+        app.logger.debug("Request to cancel a order")
+        order = Order.update_by_id(
+            order_id, Order.status != OrderStatus.CANCELED, status=OrderStatus.CANCELED
+        )
+        if order is None:
+            # Either there is no such order, or it was already canceled and
+            # is returned as-is without writing to the database
+            order = Order.find(order_id)
+            if order is None:
+                abort(
+                    status.HTTP_404_NOT_FOUND,
+                    f"Order with id '{order_id}' was not found.",
+                )
+            return order.serialize(include_items=False), status.HTTP_200_OK
 
-        order.update()
+        order_cache.invalidate(order.id)
         app.logger.info("order with id [%s] has been canceled!", order.id)
 
-        return order.serialize(), status.HTTP_200_OK
+        return order.serialize(include_items=False), status.HTTP_200_OK
 
 
-@api.route("/orders/<order_id>/items/<item_id>")
+@api.route("/orders/<int:order_id>/items/<int:item_id>")
 @api.param("order_id", "The Order identifier")
 @api.param("item_id", "The Item identifier")
 class OrderItemResource(Resource):
@@ -364,17 +383,13 @@ class OrderItemResource(Resource):
     @api.marshal_with(Items_model)
     def get(self, order_id, item_id):
         """list an item in an order"""
-        app.logger.info("Request for Read an Order")
+        app.logger.debug("Request for Read an Order")
 
-        order = Order.find(order_id)
-        order = order.serialize()
-        results = order["items"]
-        for item in results:
-            if item["id"] == int(item_id):
-                print("found")
-                return item, status.HTTP_200_OK
+        item = Item.find_in_order(order_id, item_id)
+        if item is None:
+            abort(status.HTTP_404_NOT_FOUND, "Item not in Order")
 
-        abort(status.HTTP_404_NOT_FOUND, "Item not in Order")
+        return item.serialize(), status.HTTP_200_OK
 
     # PUT /orders/{order_id}/items/{item_id} - updates an Order Item record in the database
     @api.doc("update order item")
@@ -385,33 +400,21 @@ class OrderItemResource(Resource):
         updates an item by item_id in an order
         This endpoint will updates an item (specified by item_id) to the specified order
         """
-        app.logger.info("Request to update item with ID %d", item_id)
-        order = Order.find(order_id)
-        if not order:
-            api.abort(status.HTTP_404_NOT_FOUND, "Order not found")
-
-        # Check if the item exists
+        app.logger.debug("Request to update item with ID %s", item_id)
         data = api.payload
-        item = Item.find(item_id)
-        if item is None:
-            # Handle the case when the order does not exist
-            api.abort(status.HTTP_404_NOT_FOUND, "Item not found")
-
-        print(data)
+        app.logger.debug("Item update payload: %s", data)
 
-        if "title" in data:
-            item.title = data["title"]
-        if "amount" in data:
-            item.amount = data["amount"]
+        values = {key: data[key] for key in ("title", "amount") if key in data}
         if "status" in data:
-            item.status = data["status"]
+            values["status"] = getattr(ItemStatus, data["status"])
+        item = Item.update_in_order(order_id, item_id, **values)
+        if item is None:
+            # Handle the case when the order or the item does not exist
+            api.abort(status.HTTP_404_NOT_FOUND, "Item not found")
 
-        item.update()
-        order.update()
+        order_cache.invalidate(item.order_id)
 
-        location_url = url_for(
-            "order_item_resource", order_id=order_id, item_id=item_id, _external=True
-        )
+        location_url = item_location(order_id, item_id)
 
         return (
             item.serialize(),
@@ -426,25 +429,23 @@ class OrderItemResource(Resource):
         """
         Delete one item in one order
         """
-        app.logger.info(
+        app.logger.debug(
             "Request for deleting item with ID [%s] from order [%s]", item_id, order_id
         )
-        order = Order.find(order_id)
-        if order:
-            item = Item.find(item_id)
-            if (item is not None) and (str(item.order_id) == order_id):
-                item.delete()
-                app.logger.info(
-                    "Item with ID [%s] and order ID [%s] delete complete.",
-                    item_id,
-                    order_id,
-                )
-                return "", status.HTTP_204_NO_CONTENT
+        item = Item.find_in_order(order_id, item_id)
+        if item:
+            item.delete()
+            order_cache.invalidate(order_id)
+            app.logger.info(
+                "Item with ID [%s] and order ID [%s] delete complete.",
+                item_id,
+                order_id,
+            )
 
         return make_response("", status.HTTP_204_NO_CONTENT)
 
 
-@api.route("/orders/<order_id>/items")
+@api.route("/orders/<int:order_id>/items")
 @api.param("order_id", "The order identifier")
 class ItemListResource(Resource):
     """
@@ -453,26 +454,27 @@ class ItemListResource(Resource):
 
     @api.doc("get_Items")
     @api.response(404, "Items not found")
-    @api.marshal_with(Items_model)
+    @api.response(200, "Success", [Items_model])
     def get(self, order_id):
         """
         List all items in one order
         """
-        app.logger.info("Request for Item list in one order")
-        # order_id = request.args.get("order_id")
-        order = Order.find(order_id)
-        if order:
-            order = order.serialize()
-            results = order["items"]
-            # Process the query string if any
+        app.logger.debug("Request for Item list in one order")
+        cached = order_cache.get(order_id)
+        if cached is not None:
+            return cached["items"], status.HTTP_200_OK
 
-            return results, status.HTTP_200_OK
+        if not Order.exists(order_id):
+            abort(
+                status.HTTP_404_NOT_FOUND, f"Order with id '{order_id}' was not found."
+            )
+        results = Item.list_for_order(order_id)
 
-        abort(status.HTTP_404_NOT_FOUND, f"Order with id '{order_id}' was not found.")
+        return results, status.HTTP_200_OK
 
     @api.doc("create_items")
     @api.response(404, "Order ID not found")
-    @api.marshal_with(Items_model)
+    @api.marshal_with(Items_model, code=201)
     def post(self, order_id):
         """
         Create an item on an order
@@ -480,34 +482,20 @@ class ItemListResource(Resource):
 
         This endpoint will add a new item to an order.
         """
-        app.logger.info("Request to create an Item for Order with id: %s", order_id)
+        app.logger.debug("Request to create an Item for Order with id: %s", order_id)
 
-        order = Order.find(order_id)
-        if not order:
-            abort(
-                status.HTTP_404_NOT_FOUND, f"Order with id '{order_id}' was not found."
-            )
+        Order.get_or_404(order_id)
 
+        # Creating the item also bumps the order's updated_at, no Order update is needed
         item = Item()
         item.deserialize(self.api.payload)
         item.order_id = order_id
         item.amount = 1
         item.create()
+        order_cache.invalidate(order_id)
 
-        # order.items.append(item)
-        order.update()
-        # item.order_id = order_id
-        # item.update()
-
-        message = item.serialize()
-        location_url = url_for(
-            "order_item_resource",
-            order_id=order_id,
-            item_id=item.id,
-            _external=True,
-        )
+        location_url = item_location(order_id, item.id)
 
-        # print(location_url)
-        app.logger.info("Item with ID [%s] created for order: [%s].", item.id, order.id)
+        app.logger.info("Item with ID [%s] created for order: [%s].", item.id, order_id)
 
-        return message, status.HTTP_201_CREATED, {"Location": location_url}
+        return item.serialize(), status.HTTP_201_CREATED, {"Location": location_url}
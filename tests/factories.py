@@ -90,3 +90,18 @@ class ItemFactory(factory.Factory):
         choices=[ItemStatus.INSTOCK, ItemStatus.LOWSTOCK, ItemStatus.NOSTOCK]
     )
     order = factory.SubFactory(OrderFactory)
+
+
+# Field values of one fake Order, for tests that do not need varied data
+ORDER_TEMPLATE = {
+    key: value
+    for key, value in vars(OrderFactory.build()).items()
+    if not key.startswith("_") and key != "id"
+}
+
+# Field values of one fake Item, without the Order it belongs to
+ITEM_TEMPLATE = {
+    key: value
+    for key, value in vars(ItemFactory.build()).items()
+    if not key.startswith("_") and key not in ("id", "order_id", "order")
+}
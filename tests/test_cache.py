@@ -0,0 +1,82 @@
+"""
+Test cases for the Redis Order cache
+"""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import orjson
+import redis
+from service import app
+from service.common.cache import OrderCache
+
+
+######################################################################
+#  O R D E R   C A C H E   T E S T   C A S E S
+######################################################################
+class TestOrderCache(TestCase):
+    """Order Cache Tests"""
+
+    def setUp(self):
+        self.cache = OrderCache()
+        self.cache.client = MagicMock()
+
+    def test_disabled_without_redis_url(self):
+        """It should disable caching when REDIS_URL is not set"""
+        with patch.dict(app.config, {"REDIS_URL": None}):
+            self.cache.init_app(app)
+        self.assertIsNone(self.cache.client)
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get_with_etag(1), (None, None))
+        self.cache.set(1, {"id": 1})
+        self.cache.invalidate(1)
+
+    def test_init_with_redis_url(self):
+        """It should create a Redis client when REDIS_URL is set"""
+        with patch.dict(app.config, {"REDIS_URL": "redis://localhost:6379/0"}):
+            self.cache.init_app(app)
+        self.assertIsInstance(self.cache.client, redis.Redis)
+
+    def test_cache_hit(self):
+        """It should return a cached Order"""
+        self.cache.client.get.return_value = orjson.dumps({"id": 1})
+        self.assertEqual(self.cache.get(1), {"id": 1})
+        self.cache.client.get.assert_called_once_with("order:1")
+
+    def test_cache_miss(self):
+        """It should return None for an Order that is not cached"""
+        self.cache.client.get.return_value = None
+        self.assertIsNone(self.cache.get(1))
+
+    def test_cache_hit_with_etag(self):
+        """It should return a cached Order with its ETag"""
+        self.cache.client.mget.return_value = [orjson.dumps({"id": 1}), b"abc"]
+        self.assertEqual(self.cache.get_with_etag(1), ({"id": 1}, "abc"))
+        self.cache.client.mget.assert_called_once_with("order:1", "order:1:etag")
+
+    def test_cache_miss_without_etag(self):
+        """It should treat an Order cached without an ETag as a miss"""
+        self.cache.client.mget.return_value = [orjson.dumps({"id": 1}), None]
+        self.assertEqual(self.cache.get_with_etag(1), (None, None))
+
+    def test_set_and_invalidate(self):
+        """It should store and remove Orders with a TTL"""
+        self.cache.set(1, {"id": 1})
+        self.cache.client.setex.assert_called_once_with(
+            "order:1", self.cache.ttl, orjson.dumps({"id": 1})
+        )
+        self.cache.set(1, {"id": 1}, "abc")
+        self.cache.client.setex.assert_called_with(
+            "order:1:etag", self.cache.ttl, "abc"
+        )
+        self.cache.invalidate(1)
+        self.cache.client.delete.assert_called_once_with("order:1", "order:1:etag")
+
+    def test_redis_errors_fall_back(self):
+        """It should ignore Redis errors so requests use the database"""
+        self.cache.client.get.side_effect = redis.ConnectionError()
+        self.cache.client.setex.side_effect = redis.ConnectionError()
+        self.cache.client.delete.side_effect = redis.ConnectionError()
+        self.cache.client.mget.side_effect = redis.ConnectionError()
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get_with_etag(1), (None, None))
+        self.cache.set(1, {"id": 1})
+        self.cache.invalidate(1)
@@ -0,0 +1,73 @@
+"""
+Test cases for the gunicorn configuration
+"""
+import os
+import subprocess
+import sys
+import runpy
+import textwrap
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+from sqlalchemy import make_url
+from tests.helpers import DATABASE_URI
+
+GUNICORN_CONF = Path(__file__).resolve().parent.parent / "gunicorn.conf.py"
+
+# Loads the configuration and monkey patches the standard library, as
+# gunicorn and its gevent worker do, then runs 4 queries in greenlets
+CONCURRENT_QUERIES = textwrap.dedent(
+    """
+    import runpy
+    import sys
+    import time
+    runpy.run_path(sys.argv[1])
+    from gevent import monkey
+    monkey.patch_all()
+    import gevent
+    import psycopg
+
+    def sleep():
+        with psycopg.connect(sys.argv[2]) as conn:
+            conn.execute("SELECT pg_sleep(0.5)")
+
+    start = time.monotonic()
+    gevent.joinall([gevent.spawn(sleep) for _ in range(4)])
+    print(time.monotonic() - start)
+    """
+)
+
+
+######################################################################
+#  G U N I C O R N   C O N F I G   T E S T   C A S E S
+######################################################################
+class TestGunicornConfig(TestCase):
+    """Gunicorn Configuration Tests"""
+
+    def test_workers(self):
+        """It should start one worker unless GUNICORN_WORKERS is set"""
+        with patch.dict(os.environ):
+            os.environ.pop("GUNICORN_WORKERS", None)
+            self.assertEqual(runpy.run_path(str(GUNICORN_CONF))["workers"], 1)
+            os.environ["GUNICORN_WORKERS"] = "3"
+            self.assertEqual(runpy.run_path(str(GUNICORN_CONF))["workers"], 3)
+
+    def test_gevent_worker_overlaps_queries(self):
+        """It should run the database queries of a gevent worker concurrently"""
+        env = {key: value for key, value in os.environ.items() if key != "PSYCOPG_WAIT_FUNC"}
+        conninfo = make_url(DATABASE_URI).set(drivername="postgresql")
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                CONCURRENT_QUERIES,
+                str(GUNICORN_CONF),
+                conninfo.render_as_string(hide_password=False),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # One after the other the four queries would take 2 seconds
+        self.assertLess(float(result.stdout), 1.5)